@@ -10,6 +10,7 @@ Or deploy to Streamlit Cloud for free.
 import streamlit as st
 import os
 import json
+import re
 import time
 import requests
 import random
@@ -32,6 +33,10 @@ if 'generated_pages' not in st.session_state:
     st.session_state.generated_pages = []
 if 'current_site' not in st.session_state:
     st.session_state.current_site = None
+if 'failure_queue' not in st.session_state:
+    st.session_state.failure_queue = None
+if 'breakers' not in st.session_state:
+    st.session_state.breakers = {}
 
 # =============================================================================
 # SITE CONFIGURATIONS - Add new sites here
@@ -101,6 +106,10 @@ NICHE_TEMPLATES = {
             "insurance": "PPO only, never mention Medicaid/Medicare",
             "tone": "Helpful directory, not facility marketing",
             "cta": "Free consultation, no pressure"
+        },
+        "compliance": {
+            "forbidden_terms": ["guaranteed recovery", "guaranteed sobriety", "100% success", "cure addiction"],
+            "cta_terms": ["free consultation", "free guidance", "free, confidential", "no pressure"]
         }
     },
     "home_services": {
@@ -114,6 +123,10 @@ NICHE_TEMPLATES = {
         "content_requirements": {
             "tone": "Local expert, trustworthy",
             "cta": "Free estimate"
+        },
+        "compliance": {
+            "forbidden_terms": [],
+            "cta_terms": ["free estimate"]
         }
     },
     "health_insurance": {
@@ -127,43 +140,183 @@ NICHE_TEMPLATES = {
         "content_requirements": {
             "compliance": "No specific health claims",
             "tone": "Helpful broker, educational"
+        },
+        "compliance": {
+            "forbidden_terms": ["cures", "will cure", "guaranteed approval", "prevents disease"],
+            "cta_terms": []
         }
     }
 }
 
+# Length rules applied to every niche
+COMPLIANCE_DEFAULTS = {
+    "min_words": 500,
+    "max_title_length": 70,
+    "max_meta_length": 160
+}
+
+# =============================================================================
+# FAILURE HANDLING - Retries, circuit breakers, dead-letter queue
+# =============================================================================
+
+FAILURE_QUEUE_PATH = "failed_items.json"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class ProviderError(Exception):
+    """Error reported in a provider's response body - retrying won't change it"""
+
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated consecutive failures"""
+
+    def __init__(self, provider: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return "half_open"  # let one trial call through
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.time()
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Client errors (bad key, bad request) won't fix themselves on retry"""
+    if isinstance(exc, (CircuitOpenError, ProviderError)):
+        return False
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    if status and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+def call_with_retry(func, breaker: CircuitBreaker, max_retries: int = 3,
+                    base_delay: float = 1.0, max_delay: float = 30.0):
+    """Call func with exponential backoff + full jitter, guarded by a circuit breaker.
+
+    The breaker counts one failure per call that exhausts its retries, not one
+    per attempt, so failure_threshold means consecutive failed items.
+    """
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"{breaker.provider} circuit open after {breaker.failures} consecutive failures"
+            )
+        try:
+            result = func()
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries or not is_retryable(e):
+                breaker.record_failure()
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+            continue
+        breaker.record_success()
+        return result
+
+
+def get_breaker(breakers: Dict, provider: str) -> CircuitBreaker:
+    """Fetch (or create) the shared breaker for a provider"""
+    if provider not in breakers:
+        breakers[provider] = CircuitBreaker(provider)
+    return breakers[provider]
+
+
+class FailureQueue:
+    """Persistent dead-letter queue of items that failed after all retries.
+
+    Items are keyed by stage + key, so re-failing an item updates it in place
+    and a successful reprocess removes it.
+    """
+
+    def __init__(self, path: str = FAILURE_QUEUE_PATH):
+        self.path = path
+        self.items = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(self.items, f, indent=2)
+        except OSError:
+            pass  # read-only filesystem - queue still lives for this session
+
+    def add(self, stage: str, key: str, provider: str, payload: Dict, error):
+        item_id = f"{stage}:{key}"
+        existing = self.items.get(item_id, {})
+        now = datetime.now().isoformat()
+        self.items[item_id] = {
+            'stage': stage,
+            'key': key,
+            'provider': provider,
+            'payload': payload,
+            'error': error if isinstance(error, str) else f"{type(error).__name__}: {error}",
+            'attempts': existing.get('attempts', 0) + 1,
+            'first_failed': existing.get('first_failed', now),
+            'last_failed': now
+        }
+        self._save()
+
+    def resolve(self, stage: str, key: str):
+        if self.items.pop(f"{stage}:{key}", None) is not None:
+            self._save()
+
+    def pending(self, stage: str = None) -> List[Dict]:
+        return [item for item in self.items.values() if stage is None or item['stage'] == stage]
+
+    def clear(self, stage: str = None):
+        self.items = {k: v for k, v in self.items.items() if stage is not None and v['stage'] != stage}
+        self._save()
+
 # =============================================================================
 # SERP EXTRACTION
 # =============================================================================
 
 class SERPExtractor:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, failures: FailureQueue = None, breakers: Dict = None):
         self.api_key = api_key
+        self.failures = failures if failures is not None else FailureQueue()
+        self.breakers = breakers if breakers is not None else {}
+        self.failed_keys = []  # SERP items that failed during this extractor's run
         self.results = {
             'pages_to_build': [],
             'total_keywords': 0,
             'extraction_date': datetime.now().isoformat()
         }
     
-    def get_autocomplete(self, query: str) -> List[str]:
-        """Get Google autocomplete suggestions"""
-        suggestions = []
-        try:
-            url = "http://suggestqueries.google.com/complete/search"
-            params = {"client": "firefox", "q": query}
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            if len(data) > 1:
-                suggestions = data[1]
-        except:
-            pass
-        return suggestions
-    
     def get_serp_data(self, keyword: str, location: str) -> Dict:
         """Get PAA and related searches from SerpAPI"""
         if not self.api_key:
             return {'paa': [], 'related': []}
         
-        try:
+        def fetch():
             url = "https://serpapi.com/search"
             params = {
                 "q": f"{keyword} {location}",
@@ -172,14 +325,28 @@ class SERPExtractor:
                 "engine": "google"
             }
             response = requests.get(url, params=params, timeout=30)
+            response.raise_for_status()
             data = response.json()
-            
-            paa = [q.get('question', '') for q in data.get('related_questions', [])]
-            related = [r.get('query', '') for r in data.get('related_searches', [])]
-            
-            return {'paa': paa, 'related': related}
+            # SerpAPI reports quota/location problems in the body, not the status code
+            if data.get('error'):
+                if "hasn't returned any results" in data['error']:
+                    return {}  # a real, empty SERP
+                raise ProviderError(data['error'])
+            return data
+        
+        key = f"{keyword} | {location}"
+        try:
+            data = call_with_retry(fetch, get_breaker(self.breakers, 'serpapi'))
         except Exception as e:
+            self.failures.add('serp', key, 'serpapi', {'keyword': keyword, 'location': location}, e)
+            self.failed_keys.append(key)
             return {'paa': [], 'related': [], 'error': str(e)}
+        
+        self.failures.resolve('serp', key)
+        paa = [q.get('question', '') for q in data.get('related_questions', [])]
+        related = [r.get('query', '') for r in data.get('related_searches', [])]
+        
+        return {'paa': paa, 'related': related}
     
     def calculate_priority(self, keyword: str, location: str, paa_count: int, related_count: int) -> int:
         """Score 0-100 based on opportunity signals"""
@@ -204,6 +371,41 @@ class SERPExtractor:
         
         return min(score, 100)
     
+    def add_page(self, keyword: str, location: str, serp: Dict):
+        """Score a successful SERP pull and add it to the build plan"""
+        priority = self.calculate_priority(
+            keyword, location, 
+            len(serp.get('paa', [])), 
+            len(serp.get('related', []))
+        )
+        
+        # Replace any earlier entry so reprocessing never duplicates a page
+        self.results['pages_to_build'] = [
+            p for p in self.results['pages_to_build']
+            if (p['keyword'], p['location']) != (keyword, location)
+        ]
+        self.results['pages_to_build'].append({
+            'full_keyword': f"{keyword} {location.split(',')[0]}",
+            'keyword': keyword,
+            'location': location,
+            'paa_questions': serp.get('paa', []),
+            'related_searches': serp.get('related', []),
+            'priority': priority
+        })
+    
+    def tier_results(self) -> Dict:
+        """Sort by priority and bucket pages into tiers"""
+        self.results['pages_to_build'].sort(key=lambda x: x['priority'], reverse=True)
+        self.results['total_keywords'] = len(self.results['pages_to_build'])
+        
+        pages = self.results['pages_to_build']
+        self.results['tier_1'] = [p for p in pages if p['priority'] >= 80]
+        self.results['tier_2'] = [p for p in pages if 65 <= p['priority'] < 80]
+        self.results['tier_3'] = [p for p in pages if 50 <= p['priority'] < 65]
+        self.results['tier_4'] = [p for p in pages if p['priority'] < 50]
+        
+        return self.results
+    
     def extract_all(self, keywords: List[str], locations: List[str], progress_callback=None) -> Dict:
         """Full extraction for all keyword/location combinations"""
         total = len(keywords) * len(locations)
@@ -217,61 +419,211 @@ class SERPExtractor:
                 if progress_callback:
                     progress_callback(current / total, f"Processing: {full_keyword}")
                 
-                # Get SERP data
+                # Get SERP data - failures go to the dead-letter queue, not the build plan
                 serp = self.get_serp_data(keyword, location)
-                
-                # Calculate priority
-                priority = self.calculate_priority(
-                    keyword, location, 
-                    len(serp.get('paa', [])), 
-                    len(serp.get('related', []))
-                )
-                
-                # Add to results
-                self.results['pages_to_build'].append({
-                    'full_keyword': full_keyword,
-                    'keyword': keyword,
-                    'location': location,
-                    'paa_questions': serp.get('paa', []),
-                    'related_searches': serp.get('related', []),
-                    'priority': priority
-                })
+                if 'error' not in serp:
+                    self.add_page(keyword, location, serp)
                 
                 # Rate limiting for SerpAPI
                 if self.api_key:
                     time.sleep(2)
         
-        # Sort by priority
-        self.results['pages_to_build'].sort(key=lambda x: x['priority'], reverse=True)
-        self.results['total_keywords'] = len(self.results['pages_to_build'])
+        return self.tier_results()
+    
+    def retry_failed(self, results: Dict = None, progress_callback=None) -> Dict:
+        """Re-pull only the SERP items sitting in the dead-letter queue"""
+        if results:
+            self.results = results
         
-        # Tier the results
-        pages = self.results['pages_to_build']
-        self.results['tier_1'] = [p for p in pages if p['priority'] >= 80]
-        self.results['tier_2'] = [p for p in pages if 65 <= p['priority'] < 80]
-        self.results['tier_3'] = [p for p in pages if 50 <= p['priority'] < 65]
-        self.results['tier_4'] = [p for p in pages if p['priority'] < 50]
+        failed = self.failures.pending('serp')
+        for i, item in enumerate(failed):
+            keyword, location = item['payload']['keyword'], item['payload']['location']
+            
+            if progress_callback:
+                progress_callback((i + 1) / len(failed), f"Retrying: {keyword} {location}")
+            
+            serp = self.get_serp_data(keyword, location)
+            if 'error' not in serp:
+                self.add_page(keyword, location, serp)
+            
+            if self.api_key:
+                time.sleep(2)
         
-        return self.results
+        return self.tier_results()
 
 # =============================================================================
 # CONTENT GENERATION
 # =============================================================================
 
+PAGE_FIELDS = ['title', 'meta_description', 'slug', 'h1', 'subtitle']
+
+# The prompt asks for four sections - fewer means the copy was truncated
+EXPECTED_SECTIONS = 4
+
+# Tool schema Claude must fill in - replaces "output ONLY valid JSON" prompting
+PAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{field: {"type": "string"} for field in PAGE_FIELDS},
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"heading": {"type": "string"}, "content": {"type": "string"}},
+                "required": ["heading", "content"]
+            }
+        },
+        "faqs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"q": {"type": "string"}, "a": {"type": "string"}},
+                "required": ["q", "a"]
+            }
+        }
+    },
+    "required": PAGE_FIELDS + ["sections", "faqs"]
+}
+
+
+def validate_page(content: Dict) -> List[str]:
+    """Check generated content against PAGE_SCHEMA - returns problems, empty if valid"""
+    if not isinstance(content, dict):
+        return ["content is not an object"]
+    
+    problems = [f"missing {field}" for field in PAGE_FIELDS
+                if not isinstance(content.get(field), str) or not content[field].strip()]
+    
+    for key, item_keys in (('sections', ('heading', 'content')), ('faqs', ('q', 'a'))):
+        items = content.get(key)
+        if not isinstance(items, list):
+            problems.append(f"missing {key}")
+            continue
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or not all(isinstance(item.get(k), str) and item[k].strip() for k in item_keys):
+                problems.append(f"{key}[{i}] incomplete")
+    
+    if isinstance(content.get('sections'), list) and not content['sections']:
+        problems.append("no sections")
+    
+    return problems
+
+
+def _close_truncated_json(text: str) -> str:
+    """Cut truncated JSON back to its last complete value and close open brackets"""
+    stack = []
+    in_string = escape = False
+    cut, cut_stack = None, None
+    
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+            cut, cut_stack = i + 1, list(stack)
+        elif ch == ',':
+            cut, cut_stack = i, list(stack)
+    
+    if cut is None:
+        raise ValueError("Response too truncated to repair")
+    return text[:cut] + ''.join(reversed(cut_stack))
+
+
+def repair_json(text: str) -> Dict:
+    """Parse near-valid model JSON: code fences, chatter before/after, truncated output"""
+    starts = [i for i, ch in enumerate(text) if ch == '{']
+    if not starts:
+        raise ValueError("No JSON object in response")
+    
+    # Leading chatter may contain braces - take the first position that decodes,
+    # whole (ignoring trailing text) or after closing a truncated object
+    decoder = json.JSONDecoder()
+    for start in starts:
+        try:
+            content, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            try:
+                content = json.loads(_close_truncated_json(text[start:]))
+            except ValueError:
+                continue
+        if isinstance(content, dict):
+            return content
+    raise ValueError("Could not repair JSON response")
+
+
 class ContentGenerator:
-    def __init__(self, api_key: str, site_config: Dict):
+    def __init__(self, api_key: str, site_config: Dict, failures: FailureQueue = None, breakers: Dict = None,
+                 structured: bool = True):
         self.api_key = api_key
         self.site = site_config
+        self.failures = failures if failures is not None else FailureQueue()
+        self.breakers = breakers if breakers is not None else {}
+        self.structured = structured
+        self.scanner = ComplianceScanner(site_config)
+        # 'saved' = repaired responses that still pass compliance, i.e. regenerations saved
+        self.stats = {'calls': 0, 'clean': 0, 'repaired': 0, 'saved': 0, 'failed': 0}
+        self.last_repaired = False
+    
+    def page_defaults(self, keyword: str, location: str) -> Dict:
+        """Templated fields - used in the prompt and to backfill missing fields"""
+        return {
+            'title': f"{keyword.title()} | {self.site['name']}",
+            'meta_description': f"Find {keyword} options in {location}. Free guidance on costs, insurance, and programs. Call 24/7.",
+            'slug': f"{keyword.lower().replace(' ', '-')}-{location.lower().split(',')[0].replace(' ', '-')}",
+            'h1': keyword.title(),
+            'subtitle': f"Expert Guidance for {location} Area Residents"
+        }
+    
+    def repair_page(self, content: Dict, keyword: str, location: str) -> Dict:
+        """Local repair pass: backfill templated fields, drop incomplete sections/FAQs"""
+        if not isinstance(content, dict):
+            raise ValueError("content is not an object")
+        
+        repaired = dict(content)
+        for field, default in self.page_defaults(keyword, location).items():
+            if not isinstance(repaired.get(field), str) or not repaired[field].strip():
+                repaired[field] = default
+        
+        for key, item_keys in (('sections', ('heading', 'content')), ('faqs', ('q', 'a'))):
+            items = repaired.get(key) if isinstance(repaired.get(key), list) else []
+            repaired[key] = [
+                item for item in items
+                if isinstance(item, dict) and all(isinstance(item.get(k), str) and item[k].strip() for k in item_keys)
+            ]
+        
+        return repaired
+    
+    def stats_summary(self) -> str:
+        calls = self.stats['calls']
+        if not calls:
+            return "No generation calls this run."
+        return (f"{self.stats['saved']} of {calls} responses repaired locally into publishable pages - "
+                f"{self.stats['saved'] / calls:.0%} regenerations saved | "
+                f"{self.stats['repaired'] - self.stats['saved']} repaired but blocked | "
+                f"{self.stats['failed']} unrecoverable (queued)")
         
     def generate_page(self, keyword: str, location: str, paa_questions: List[str]) -> Dict:
         """Generate page content using Claude"""
         
         from anthropic import Anthropic
-        client = Anthropic(api_key=self.api_key)
+        # Retries are handled by call_with_retry so backoff and the breaker see every attempt
+        client = Anthropic(api_key=self.api_key, max_retries=0)
         
         paa_str = "\n".join([f"- {q}" for q in paa_questions[:5]]) if paa_questions else "- How much does treatment cost?\n- Does insurance cover this?"
+        defaults = self.page_defaults(keyword, location)
+        cta = NICHE_TEMPLATES.get(self.site.get('niche'), {}).get('content_requirements', {}).get('cta', 'Free consultation')
+        output_rule = "Call the save_page tool with the page." if self.structured else "Output ONLY valid JSON."
         
-        prompt = f"""Generate a treatment resource page. Output ONLY valid JSON.
+        prompt = f"""Generate a treatment resource page. {output_rule}
 
 SITE: {self.site['name']} ({self.site['domain']})
 PARENT ORG: {self.site['parent_org']}
@@ -288,15 +640,16 @@ REQUIREMENTS:
 - {self.site.get('insurance_focus', 'Accept most insurance')}
 - Helpful directory voice, NOT facility marketing
 - Mention {self.site['parent_org']} naturally as serving the area
+- Include the phone number {self.site['phone']} and the call to action "{cta}" in the copy
 
 Generate this JSON:
 
 {{
-  "title": "{keyword.title()} | {self.site['name']}",
-  "meta_description": "Find {keyword} options in {location}. Free guidance on costs, insurance, and programs. Call 24/7.",
-  "slug": "{keyword.lower().replace(' ', '-')}-{location.lower().split(',')[0].replace(' ', '-')}",
-  "h1": "{keyword.title()}",
-  "subtitle": "Expert Guidance for {location} Area Residents",
+  "title": "{defaults['title']}",
+  "meta_description": "{defaults['meta_description']}",
+  "slug": "{defaults['slug']}",
+  "h1": "{defaults['h1']}",
+  "subtitle": "{defaults['subtitle']}",
   "sections": [
     {{"heading": "Understanding {keyword.title()}", "content": "[150-200 words educational overview]"}},
     {{"heading": "Options Near {location}", "content": "[150-200 words on local treatment landscape, mention {self.site['parent_org']}]"}},
@@ -310,24 +663,115 @@ Generate this JSON:
   ]
 }}
 
-Output ONLY valid JSON."""
+{output_rule}"""
 
+        request = {
+            'model': "claude-sonnet-4-20250514",
+            'max_tokens': 4000,
+            'messages': [{"role": "user", "content": prompt}]
+        }
+        if self.structured:
+            request['tools'] = [{
+                'name': 'save_page',
+                'description': 'Save the generated resource page.',
+                'input_schema': PAGE_SCHEMA
+            }]
+            request['tool_choice'] = {'type': 'tool', 'name': 'save_page'}
+        
         try:
-            message = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4000,
-                messages=[{"role": "user", "content": prompt}]
+            message = call_with_retry(
+                lambda: client.messages.create(**request),
+                get_breaker(self.breakers, 'anthropic')
             )
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        
+        self.stats['calls'] += 1
+        try:
+            tool_input = next((block.input for block in message.content if block.type == 'tool_use'), None)
+            if tool_input is not None:
+                content = tool_input
+                repaired = False
+            else:
+                text = "".join(block.text for block in message.content if block.type == 'text').strip()
+                stripped = text
+                if stripped.startswith("```"):
+                    stripped = stripped.split("```")[1]
+                    if stripped.startswith("json"):
+                        stripped = stripped[4:]
+                try:
+                    content = json.loads(stripped.strip())
+                    repaired = False
+                except ValueError:
+                    content = repair_json(text)
+                    repaired = True
             
-            text = message.content[0].text.strip()
-            if text.startswith("```"):
-                text = text.split("```")[1]
-                if text.startswith("json"):
-                    text = text[4:]
+            if validate_page(content):
+                content = self.repair_page(content, keyword, location)
+                repaired = True
+                problems = validate_page(content)
+                if problems:
+                    raise ValueError("; ".join(problems))
             
-            return json.loads(text.strip())
+            # A page that lost sections to truncation isn't worth keeping - queue a regeneration
+            if len(content['sections']) < EXPECTED_SECTIONS:
+                raise ValueError(f"truncated: {len(content['sections'])} of {EXPECTED_SECTIONS} sections")
         except Exception as e:
-            return {"error": str(e)}
+            self.stats['failed'] += 1
+            return {"error": f"{type(e).__name__}: {e}"}
+        
+        self.stats['repaired' if repaired else 'clean'] += 1
+        self.last_repaired = repaired
+        return content
+    
+    def build_page(self, page: Dict) -> Dict:
+        """Generate one build-plan page into a publishable entry, or queue it on failure"""
+        content = self.generate_page(
+            page['keyword'],
+            page['location'],
+            page.get('paa_questions', [])
+        )
+        
+        if 'error' in content:
+            self.failures.add('generate', page['full_keyword'], 'anthropic', page, content['error'])
+            return None
+        
+        self.failures.resolve('generate', page['full_keyword'])
+        html = self.to_wordpress_html(content)
+        
+        # Random backdate
+        days_ago = random.randint(1, 180)
+        publish_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%dT%H:%M:%S')
+        
+        entry = {
+            'keyword': page['full_keyword'],
+            'content': content,
+            'html': html,
+            'publish_date': publish_date
+        }
+        
+        # Only a repair that yields a publishable page actually saved a regeneration
+        if self.last_repaired and not self.scanner.scan_page(entry):
+            self.stats['saved'] += 1
+        
+        return entry
+    
+    def retry_failed(self, progress_callback=None) -> List[Dict]:
+        """Regenerate only the pages sitting in the dead-letter queue"""
+        generated = []
+        failed = self.failures.pending('generate')
+        
+        for i, item in enumerate(failed):
+            if progress_callback:
+                progress_callback((i + 1) / len(failed), f"Retrying: {item['key']}")
+            
+            entry = self.build_page(item['payload'])
+            if entry:
+                generated.append(entry)
+            
+            time.sleep(1)  # Rate limiting
+        
+        return generated
     
     def to_wordpress_html(self, content: Dict) -> str:
         """Convert to WordPress-ready HTML"""
@@ -370,14 +814,146 @@ Output ONLY valid JSON."""
         
         return html
 
+# =============================================================================
+# COMPLIANCE SCANNING
+# =============================================================================
+
+def excluded_terms(insurance_focus: str) -> List[str]:
+    """'PPO only - no Medicaid/Medicare' -> ['Medicaid', 'Medicare']"""
+    match = re.search(r'\bno\s+(.+)', insurance_focus or '', re.IGNORECASE)
+    if not match:
+        return []
+    return [t.strip() for t in re.split(r'[/,]|\bor\b|\band\b', match.group(1)) if t.strip()]
+
+
+def trie_pattern(terms: List[str]) -> str:
+    """Compile terms into one trie-shaped regex so shared prefixes are matched once"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}  # end of term
+    
+    def walk(node: Dict) -> str:
+        alts = [re.escape(ch) + walk(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        pattern = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+    
+    return walk(trie)
+
+
+class ComplianceScanner:
+    """Checks generated pages against niche + site rules in a single pass per page.
+
+    Forbidden terms and required mentions (CTA, phone, parent org) are compiled
+    into one multi-pattern matcher (Aho-Corasick style trie, run by the regex
+    engine), so each page is scanned once no matter how many rules there are.
+    """
+
+    def __init__(self, site_config: Dict):
+        self.site = site_config
+        compliance = NICHE_TEMPLATES.get(site_config.get('niche'), {}).get('compliance', {})
+        self.limits = {**COMPLIANCE_DEFAULTS, **{k: v for k, v in compliance.items() if k in COMPLIANCE_DEFAULTS}}
+        
+        forbidden = compliance.get('forbidden_terms', []) + excluded_terms(site_config.get('insurance_focus', ''))
+        self.required = {
+            'CTA': compliance.get('cta_terms', []),
+            'phone': [site_config['phone']] if site_config.get('phone') else [],
+            'parent org': [site_config['parent_org']] if site_config.get('parent_org') else []
+        }
+        self.required = {name: terms for name, terms in self.required.items() if terms}
+        
+        # term -> ('forbidden', term) or ('required', group name)
+        self.rules = {}
+        for term in forbidden:
+            self.rules[self._normalize(term)] = ('forbidden', term)
+        for name, terms in self.required.items():
+            for term in terms:
+                self.rules.setdefault(self._normalize(term), ('required', name))
+        
+        self.matcher = None
+        if self.rules:
+            self.matcher = re.compile(r'(?<!\w)' + trie_pattern(list(self.rules)) + r'(?!\w)')
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return ' '.join(text.lower().split())
+    
+    def scan_page(self, page: Dict) -> List[str]:
+        """Return the page's violations - empty means compliant"""
+        content = page.get('content', {})
+        # Only the model-generated copy - the HTML template always carries the
+        # phone and a CTA, which would satisfy the required checks on its own
+        text = self._normalize(" ".join(
+            [content.get(field, '') for field in PAGE_FIELDS if field != 'slug'] +
+            [f"{s.get('heading', '')} {s.get('content', '')}" for s in content.get('sections', [])] +
+            [f"{f.get('q', '')} {f.get('a', '')}" for f in content.get('faqs', [])]
+        ))
+        
+        violations = []
+        found_forbidden = set()
+        found_required = set()
+        if self.matcher:
+            for match in self.matcher.finditer(text):
+                kind, name = self.rules[match.group()]
+                (found_forbidden if kind == 'forbidden' else found_required).add(name)
+        
+        violations += [f"forbidden term: {term}" for term in sorted(found_forbidden)]
+        violations += [f"missing {name} mention" for name in self.required if name not in found_required]
+        
+        body = " ".join(
+            [s.get('content', '') for s in content.get('sections', [])] +
+            [f.get('a', '') for f in content.get('faqs', [])]
+        )
+        words = len(body.split())
+        if words < self.limits['min_words']:
+            violations.append(f"too short: {words} words (min {self.limits['min_words']})")
+        if len(content.get('title', '')) > self.limits['max_title_length']:
+            violations.append(f"title over {self.limits['max_title_length']} chars")
+        if len(content.get('meta_description', '')) > self.limits['max_meta_length']:
+            violations.append(f"meta description over {self.limits['max_meta_length']} chars")
+        
+        return violations
+    
+    def scan_batch(self, pages: List[Dict]) -> List[Dict]:
+        """Scan a batch of generated pages with the one compiled matcher"""
+        results = []
+        for page in pages:
+            violations = self.scan_page(page)
+            results.append({
+                'keyword': page.get('keyword', ''),
+                'compliant': not violations,
+                'violations': violations
+            })
+        return results
+
 # =============================================================================
 # WORDPRESS PUBLISHING
 # =============================================================================
 
 class WordPressPublisher:
-    def __init__(self, url: str, user: str, password: str):
+    def __init__(self, url: str, user: str, password: str, failures: FailureQueue = None, breakers: Dict = None):
         self.url = url.rstrip('/')
         self.auth = (user, password)
+        self.failures = failures if failures is not None else FailureQueue()
+        self.breakers = breakers if breakers is not None else {}
+    
+    def find_page(self, slug: str) -> Dict:
+        """Look up an existing page (any status) by slug, or None"""
+        response = requests.get(
+            f"{self.url}/wp-json/wp/v2/pages",
+            params={'slug': slug, 'status': 'any'},
+            auth=self.auth,
+            timeout=30
+        )
+        response.raise_for_status()
+        pages = response.json()
+        return pages[0] if pages else None
     
     def publish_page(self, title: str, content: str, slug: str, meta_desc: str, publish_date: str = None) -> Dict:
         """Publish page to WordPress"""
@@ -395,13 +971,67 @@ class WordPressPublisher:
         if publish_date:
             data['date'] = publish_date
         
-        try:
+        # Creating a page isn't idempotent - a timeout or 5xx may come back after
+        # WordPress already made it. Check the slug before every POST so retries
+        # (and later queue reprocessing) never create "-2" duplicates.
+        def post():
+            if slug:
+                existing = self.find_page(slug)
+                if existing:
+                    return {**existing, 'existing': True}
             response = requests.post(endpoint, json=data, auth=self.auth, timeout=30)
             response.raise_for_status()
-            result = response.json()
-            return {'success': True, 'id': result.get('id'), 'url': result.get('link')}
+            return response.json()
+        
+        try:
+            # Without a slug there's nothing to check, so don't risk a retry
+            result = call_with_retry(post, get_breaker(self.breakers, 'wordpress'), max_retries=3 if slug else 0)
+            return {'success': True, 'id': result.get('id'), 'url': result.get('link'),
+                    'existing': result.get('existing', False)}
         except Exception as e:
-            return {'success': False, 'error': str(e)}
+            return {'success': False, 'error': f"{type(e).__name__}: {e}"}
+    
+    def publish_generated(self, page: Dict) -> Dict:
+        """Publish a generated page entry, queueing it on failure"""
+        result = self.publish_page(
+            title=page['content'].get('title', page['keyword']),
+            content=page['html'],
+            slug=page['content'].get('slug', ''),
+            meta_desc=page['content'].get('meta_description', ''),
+            publish_date=page['publish_date']
+        )
+        
+        if result.get('success'):
+            self.failures.resolve('publish', page['keyword'])
+        else:
+            self.failures.add('publish', page['keyword'], 'wordpress', page, result['error'])
+        
+        return result
+    
+    def retry_failed(self, scanner: ComplianceScanner, progress_callback=None) -> Dict:
+        """Re-publish only the queued pages that still pass the compliance scan.
+
+        Non-compliant pages stay in the queue unposted - the queue outlives the
+        session, so rules may have changed since the page was first published.
+        """
+        success = 0
+        blocked = 0
+        failed = self.failures.pending('publish')
+        
+        for i, item in enumerate(failed):
+            if progress_callback:
+                progress_callback((i + 1) / len(failed), f"Retrying: {item['key']}")
+            
+            if scanner.scan_page(item['payload']):
+                blocked += 1
+                continue
+            
+            if self.publish_generated(item['payload']).get('success'):
+                success += 1
+            
+            time.sleep(0.5)
+        
+        return {'success': success, 'failed': len(failed) - success - blocked, 'blocked': blocked}
 
 # =============================================================================
 # STREAMLIT UI
@@ -424,6 +1054,13 @@ def main():
         site = SITES[site_key]
         st.session_state.current_site = site
         
+        # One dead-letter queue file per site
+        queue_path = f"failed_items_{site_key}.json"
+        if st.session_state.failure_queue is None or st.session_state.failure_queue.path != queue_path:
+            st.session_state.failure_queue = FailureQueue(queue_path)
+        failures = st.session_state.failure_queue
+        breakers = st.session_state.breakers
+        
         st.divider()
         
         # API Keys
@@ -490,7 +1127,7 @@ def main():
             if not serpapi_key:
                 st.error("SerpAPI key required")
             else:
-                extractor = SERPExtractor(serpapi_key)
+                extractor = SERPExtractor(serpapi_key, failures, breakers)
                 
                 progress_bar = st.progress(0)
                 status_text = st.empty()
@@ -505,6 +1142,8 @@ def main():
                 st.session_state.extraction_results = results
                 
                 st.success(f"✅ Extraction complete! Found **{results['total_keywords']}** pages to build.")
+                if extractor.failed_keys:
+                    st.warning(f"**{len(extractor.failed_keys)}** keyword/location pulls failed and were queued for retry.")
                 
                 # Show tier breakdown
                 col1, col2, col3, col4 = st.columns(4)
@@ -513,6 +1152,26 @@ def main():
                 col3.metric("Tier 3 (50-64)", len(results.get('tier_3', [])))
                 col4.metric("Tier 4 (<50)", len(results.get('tier_4', [])))
         
+        # Retry only the failed pulls
+        failed_serp = failures.pending('serp')
+        if failed_serp and st.button(f"🔁 Retry {len(failed_serp)} Failed Pulls", use_container_width=True):
+            if not serpapi_key:
+                st.error("SerpAPI key required")
+            else:
+                extractor = SERPExtractor(serpapi_key, failures, breakers)
+                
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                def update_retry_progress(pct, msg):
+                    progress_bar.progress(pct)
+                    status_text.text(msg)
+                
+                st.session_state.extraction_results = extractor.retry_failed(
+                    st.session_state.extraction_results, update_retry_progress
+                )
+                st.success(f"✅ Recovered **{len(failed_serp) - len(failures.pending('serp'))}** of {len(failed_serp)} pulls")
+        
         # Show results if available
         if st.session_state.extraction_results:
             st.divider()
@@ -539,6 +1198,8 @@ def main():
     with tab2:
         st.header("Content Generation")
         
+        structured = st.checkbox("Structured output (schema-enforced tool use)", value=True)
+        
         if not st.session_state.extraction_results:
             st.warning("Run extraction first, or upload a build plan.")
             
@@ -567,7 +1228,7 @@ def main():
                 if not anthropic_key:
                     st.error("Anthropic API key required")
                 else:
-                    generator = ContentGenerator(anthropic_key, site)
+                    generator = ContentGenerator(anthropic_key, site, failures, breakers, structured)
                     
                     progress = st.progress(0)
                     status = st.empty()
@@ -578,39 +1239,52 @@ def main():
                         progress.progress((i + 1) / limit)
                         status.text(f"Generating: {page['full_keyword']}")
                         
-                        content = generator.generate_page(
-                            page['keyword'],
-                            page['location'],
-                            page.get('paa_questions', [])
-                        )
-                        
-                        if 'error' not in content:
-                            html = generator.to_wordpress_html(content)
-                            
-                            # Random backdate
-                            days_ago = random.randint(1, 180)
-                            publish_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%dT%H:%M:%S')
-                            
-                            generated.append({
-                                'keyword': page['full_keyword'],
-                                'content': content,
-                                'html': html,
-                                'publish_date': publish_date
-                            })
+                        entry = generator.build_page(page)
+                        if entry:
+                            generated.append(entry)
                         
                         time.sleep(1)  # Rate limiting
                     
                     st.session_state.generated_pages.extend(generated)
                     st.success(f"✅ Generated **{len(generated)}** pages!")
-            
-            # Show generated pages
-            if st.session_state.generated_pages:
-                st.divider()
-                st.subheader(f"Generated Pages ({len(st.session_state.generated_pages)})")
+                    st.caption(generator.stats_summary())
+                    if len(generated) < limit:
+                        st.warning(f"**{limit - len(generated)}** pages failed and were queued for retry.")
+        
+        # Regenerate only the failed pages
+        failed_generate = failures.pending('generate')
+        if failed_generate and st.button(f"🔁 Retry {len(failed_generate)} Failed Pages", use_container_width=True):
+            if not anthropic_key:
+                st.error("Anthropic API key required")
+            else:
+                generator = ContentGenerator(anthropic_key, site, failures, breakers, structured)
+                
+                progress = st.progress(0)
+                status = st.empty()
                 
-                for i, page in enumerate(st.session_state.generated_pages[-10:]):  # Show last 10
-                    with st.expander(f"{page['keyword']} | {page['publish_date'][:10]}"):
-                        st.code(page['html'][:500] + "...", language="html")
+                def update_generate_progress(pct, msg):
+                    progress.progress(pct)
+                    status.text(msg)
+                
+                generated = generator.retry_failed(update_generate_progress)
+                st.session_state.generated_pages.extend(generated)
+                st.success(f"✅ Recovered **{len(generated)}** of {len(failed_generate)} pages")
+                st.caption(generator.stats_summary())
+        
+        # Show generated pages
+        if st.session_state.generated_pages:
+            st.divider()
+            st.subheader(f"Generated Pages ({len(st.session_state.generated_pages)})")
+            
+            recent = st.session_state.generated_pages[-10:]  # Show last 10
+            scans = ComplianceScanner(site).scan_batch(recent)
+            
+            for page, scan in zip(recent, scans):
+                flag = "✅" if scan['compliant'] else "⛔"
+                with st.expander(f"{flag} {page['keyword']} | {page['publish_date'][:10]}"):
+                    for violation in scan['violations']:
+                        st.error(violation)
+                    st.code(page['html'][:500] + "...", language="html")
     
     # ===================
     # TAB 3: PUBLISHING
@@ -621,15 +1295,32 @@ def main():
         if not st.session_state.generated_pages:
             st.warning("Generate content first.")
         else:
-            st.info(f"**{len(st.session_state.generated_pages)}** pages ready to publish")
+            # Compliance gate - non-compliant pages never reach WordPress
+            scan_start = time.time()
+            scans = ComplianceScanner(site).scan_batch(st.session_state.generated_pages)
+            scan_time = time.time() - scan_start
             
-            if not wp_url or not wp_user or not wp_pass:
+            publishable = [page for page, scan in zip(st.session_state.generated_pages, scans) if scan['compliant']]
+            blocked = [scan for scan in scans if not scan['compliant']]
+            
+            st.info(f"**{len(publishable)}** pages ready to publish | **{len(blocked)}** blocked by compliance checks")
+            st.caption(f"Scanned {len(scans)} pages in {scan_time:.2f}s")
+            
+            if blocked:
+                with st.expander(f"⛔ Blocked Pages ({len(blocked)})"):
+                    df_blocked = pd.DataFrame(blocked)[['keyword', 'violations']]
+                    df_blocked['violations'] = df_blocked['violations'].apply("; ".join)
+                    st.dataframe(df_blocked, use_container_width=True)
+            
+            if not publishable:
+                st.warning("No compliant pages to publish.")
+            elif not wp_url or not wp_user or not wp_pass:
                 st.error("WordPress credentials required (see sidebar)")
             else:
-                publish_limit = st.slider("Pages to publish", 1, len(st.session_state.generated_pages), min(10, len(st.session_state.generated_pages)))
+                publish_limit = st.slider("Pages to publish", 1, len(publishable), min(10, len(publishable)))
                 
                 if st.button("📤 Publish to WordPress", type="primary", use_container_width=True):
-                    publisher = WordPressPublisher(wp_url, wp_user, wp_pass)
+                    publisher = WordPressPublisher(wp_url, wp_user, wp_pass, failures, breakers)
                     
                     progress = st.progress(0)
                     status = st.empty()
@@ -637,17 +1328,11 @@ def main():
                     success = 0
                     failed = 0
                     
-                    for i, page in enumerate(st.session_state.generated_pages[:publish_limit]):
+                    for i, page in enumerate(publishable[:publish_limit]):
                         progress.progress((i + 1) / publish_limit)
                         status.text(f"Publishing: {page['keyword']}")
                         
-                        result = publisher.publish_page(
-                            title=page['content'].get('title', page['keyword']),
-                            content=page['html'],
-                            slug=page['content'].get('slug', ''),
-                            meta_desc=page['content'].get('meta_description', ''),
-                            publish_date=page['publish_date']
-                        )
+                        result = publisher.publish_generated(page)
                         
                         if result.get('success'):
                             success += 1
@@ -657,6 +1342,26 @@ def main():
                         time.sleep(0.5)
                     
                     st.success(f"✅ Published **{success}** pages | Failed: {failed}")
+        
+        # Re-publish only the failed pages
+        failed_publish = failures.pending('publish')
+        if failed_publish and st.button(f"🔁 Retry {len(failed_publish)} Failed Publishes", use_container_width=True):
+            if not wp_url or not wp_user or not wp_pass:
+                st.error("WordPress credentials required (see sidebar)")
+            else:
+                publisher = WordPressPublisher(wp_url, wp_user, wp_pass, failures, breakers)
+                
+                progress = st.progress(0)
+                status = st.empty()
+                
+                def update_publish_progress(pct, msg):
+                    progress.progress(pct)
+                    status.text(msg)
+                
+                retried = publisher.retry_failed(ComplianceScanner(site), update_publish_progress)
+                st.success(f"✅ Published **{retried['success']}** pages | Failed: {retried['failed']}")
+                if retried['blocked']:
+                    st.warning(f"**{retried['blocked']}** queued pages fail compliance checks and were not published.")
     
     # ===================
     # TAB 4: STATUS
@@ -678,6 +1383,27 @@ def main():
         
         st.divider()
         
+        # Failure queue + provider health
+        st.subheader("Failed Items")
+        
+        if breakers:
+            breaker_cols = st.columns(len(breakers))
+            for col, (provider, breaker) in zip(breaker_cols, breakers.items()):
+                col.metric(provider, breaker.state.replace('_', ' ').title(), f"{breaker.failures} consecutive failures", delta_color="off")
+        
+        pending = failures.pending()
+        if pending:
+            df_failed = pd.DataFrame(pending)[['stage', 'key', 'provider', 'attempts', 'last_failed', 'error']]
+            st.dataframe(df_failed, use_container_width=True)
+            
+            if st.button("🗑️ Clear Failed Items"):
+                failures.clear()
+                st.rerun()
+        else:
+            st.success("No failed items.")
+        
+        st.divider()
+        
         # Site overview
         st.subheader("Site Configuration")
         st.json(site)